@@ -1,223 +1,377 @@
-import streamlit as st
-import yfinance as yf
-import pandas as pd
-import mplfinance as mpf
-from datetime import datetime
-import os
-from reportlab.platypus import SimpleDocTemplate, Paragraph
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.enums import TA_CENTER
-from reportlab.lib import colors
-
-# ----------------------------------------------------------
-# AUTO LOAD ALL NSE STOCK SYMBOLS
-# ----------------------------------------------------------
-@st.cache_data
-def get_all_nse_stocks():
-    try:
-        url = "https://archives.nseindia.com/content/equities/EQUITY_L.csv"
-        df = pd.read_csv(url)
-        return [s + ".NS" for s in df["SYMBOL"].tolist()]
-    except:
-        return ["RELIANCE.NS", "TCS.NS", "INFY.NS"]
-
-nse_stock_list = get_all_nse_stocks()
-
-# ---------------- MARKET CAP FORMAT ----------------
-def format_market_cap(value):
-    try:
-        return f"₹{value/1e7:.2f} Cr"
-    except:
-        return "N/A"
-
-# ---------------- RATINGS ----------------
-def pe_rating(pe):
-    if pe is None or pe <= 0: return "N/A"
-    if pe < 20: return "Excellent"
-    if pe <= 35: return "Good"
-    return "Poor"
-
-# ---------------- BUYING RECOMMENDATION ----------------
-def buying_recommendation(df):
-    try:
-        df["SMA20"] = df["Close"].rolling(20).mean()
-        df["EMA20"] = df["Close"].ewm(span=20, adjust=False).mean()
-        delta = df["Close"].diff()
-        gain = delta.mask(delta < 0, 0).rolling(14).mean()
-        loss = (-delta.mask(delta > 0, 0)).rolling(14).mean()
-        rs = gain / loss
-        df["RSI"] = 100 - (100 / (1 + rs))
-
-        latest = df.iloc[-1]
-        score = 0
-        score += 40 if latest["Close"] > latest["SMA20"] else 0
-        score += 40 if latest["Close"] > latest["EMA20"] else 0
-        score += 20 if latest["RSI"] < 70 else 0
-
-        return min(score, 100)
-    except:
-        return 50
-
-# ---------------- PERFORMANCE ----------------
-def performance(df):
-    perf = {}
-    for days, label in [(21,"1 Month"), (63,"3 Month"), (126,"6 Month")]:
-        if len(df) > days:
-            perf[label] = round(((df["Close"].iloc[-1] - df["Close"].iloc[-days]) / df["Close"].iloc[-days]) * 100, 2)
-        else:
-            perf[label] = "N/A"
-    return perf
-
-# ---------------- IPO EXTRA DETAILS ----------------
-def get_ipo_extra_details():
-    return {
-        "Price Range": "N/A",
-        "Issue Size": "N/A",
-        "Lot Size": "N/A",
-        "Subscription Rate": "N/A"
-    }
-
-# ---------------- PDF SAVE ----------------
-def save_pdf(symbol, data):
-    folder = "Stock_Reports"
-    os.makedirs(folder, exist_ok=True)
-
-    now = datetime.now()
-    filename = f"{symbol} - Jayesh Thakor Analysis - {now.strftime('%d-%m-%Y %H-%M-%S')}.pdf"
-    path = os.path.join(folder, filename)
-
-    doc = SimpleDocTemplate(path, pagesize=A4)
-    styles = getSampleStyleSheet()
-
-    title = ParagraphStyle(
-        "title", fontSize=20, alignment=TA_CENTER,
-        textColor=colors.HexColor("#003366"),
-        fontName="Helvetica-Bold", spaceAfter=14
-    )
-    header = ParagraphStyle(
-        "header", alignment=TA_CENTER, fontSize=11,
-        textColor=colors.grey, spaceAfter=18
-    )
-    section = ParagraphStyle(
-        "section", fontSize=13,
-        textColor=colors.HexColor("#0b5394"),
-        fontName="Helvetica-Bold",
-        spaceBefore=14, spaceAfter=6
-    )
-    body = ParagraphStyle("body", fontSize=10, spaceAfter=5)
-
-    story = []
-    story.append(Paragraph("STOCK ANALYSIS REPORT", title))
-    story.append(Paragraph(
-        f"Report Created By : <b>Jayesh Thakor</b><br/>"
-        f"Date : {now.strftime('%d-%m-%Y')} | "
-        f"Day : {now.strftime('%A')} | "
-        f"Time : {now.strftime('%H:%M:%S')}",
-        header
-    ))
-
-    for sec, lines in data.items():
-        story.append(Paragraph(sec, section))
-        for l in lines:
-            story.append(Paragraph(l.replace("₹","Rs."), body))
-
-    doc.build(story)
-    return path
-
-
-# ----------------------------------------------------------
-# STREAMLIT UI
-# ----------------------------------------------------------
-st.set_page_config(page_title="Stock Analyzer by Jayesh", layout="wide")
-
-st.markdown("<h1 style='text-align:center;color:#00ffcc;'>📈 Stock Market Analyzer — By Jayesh Thakor</h1>", unsafe_allow_html=True)
-
-search = st.text_input("Search Stock Symbol", "").upper()
-
-suggestions = [s for s in nse_stock_list if search in s][:20]
-symbol = st.selectbox("Select Stock", suggestions)
-
-if st.button("ANALYZE STOCK"):
-    if not symbol:
-        st.warning("Please select stock.")
-    else:
-        stock = yf.Ticker(symbol)
-        df = stock.history(period="6mo")
-        info = stock.info
-
-        current = info.get("currentPrice", 0)
-        prev = info.get("previousClose", current)
-        momentum = round(((current - prev) / prev) * 100, 2)
-
-        hist = stock.history(period="max")
-        listing_date = hist.index[0].strftime("%d-%m-%Y") if not hist.empty else "N/A"
-        listing_price = round(hist.iloc[0]["Open"], 2) if not hist.empty else "N/A"
-
-        profit_pct = round(((current - listing_price) / listing_price) * 100, 2) if listing_price != "N/A" else "N/A"
-
-        perf = performance(df)
-        rec = buying_recommendation(df)
-        ipo_extra = get_ipo_extra_details()
-
-        # -------------------- SHOW REPORT --------------------
-        st.subheader("📄 Stock Report")
-        st.write(f"**Stock:** {symbol}")
-        st.write(f"**Current Price:** ₹{current}")
-        st.write(f"**Momentum:** {momentum}%")
-
-        st.subheader("IPO DETAILS")
-        st.write(f"IPO Date: {listing_date}")
-        st.write(f"IPO Price: ₹{listing_price}")
-        st.write(f"Return Since IPO: {profit_pct}%")
-
-        st.subheader("FUNDAMENTALS")
-        st.write(f"Market Cap: {format_market_cap(info.get('marketCap',0))}")
-        st.write(f"P/E Ratio: {info.get('trailingPE','N/A')} ({pe_rating(info.get('trailingPE'))})")
-
-        st.subheader("PERFORMANCE")
-        st.write(perf)
-
-        st.subheader("BUYING SCORE")
-        st.write(f"**Overall Score: {rec}%**")
-
-        # -------------------- PDF --------------------
-        report_data = {
-            "STOCK REPORT BY JAYESH THAKOR": [
-                f"Stock : {symbol}",
-                f"Current Price : ₹{current}",
-                f"Momentum : {momentum} %"
-            ],
-            "IPO DETAILS": [
-                f"IPO Listing Date : {listing_date}",
-                f"IPO Listing Price : ₹{listing_price}",
-                f"Price Range : {ipo_extra['Price Range']}",
-                f"Issue Size : {ipo_extra['Issue Size']}",
-                f"Lot Size : {ipo_extra['Lot Size']}",
-                f"Subscription Rate : {ipo_extra['Subscription Rate']}",
-                f"Return Since IPO : {profit_pct} %"
-            ],
-            "FUNDAMENTALS": [
-                f"Market Cap : {format_market_cap(info.get('marketCap',0))}",
-                f"P/E Ratio : {info.get('trailingPE','N/A')} ({pe_rating(info.get('trailingPE'))})"
-            ],
-            "PERFORMANCE": [
-                f"1 Month : {perf['1 Month']} %",
-                f"3 Month : {perf['3 Month']} %",
-                f"6 Month : {perf['6 Month']} %"
-            ],
-            "RECOMMENDATION FOR BUYING": [
-                f"Overall Score : {rec} %"
-            ]
-        }
-
-        pdf_path = save_pdf(symbol, report_data)
-        with open(pdf_path, "rb") as f:
-            st.download_button("Download PDF", f, file_name=os.path.basename(pdf_path))
-
-        # -------------------- CHART --------------------
-        st.subheader("📊 Candlestick Chart")
-        df2 = yf.download(symbol, period="15d", interval="1d")
-        mpf.plot(df2, type="candle", volume=True, style="charles")
-        st.pyplot(mpf.plot(df2, type="candle", volume=True, style="charles"))
-
+import streamlit as st
+import yfinance as yf
+import pandas as pd
+import numpy as np
+import mplfinance as mpf
+import matplotlib.pyplot as plt
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+import io
+import os
+import time
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Table, TableStyle
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.lib.enums import TA_CENTER
+from reportlab.lib import colors
+
+# On-disk cache shared by the symbol list and the per-symbol history frames.
+_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "stock_analyzer")
+
+# ----------------------------------------------------------
+# AUTO LOAD ALL NSE STOCK SYMBOLS
+# ----------------------------------------------------------
+_SYMBOL_CACHE = os.path.join(_CACHE_DIR, "nse_symbols.csv")
+_SYMBOL_CACHE_TTL = 24 * 3600
+
+@st.cache_data
+def get_all_nse_stocks():
+    try:
+        if (os.path.exists(_SYMBOL_CACHE)
+                and time.time() - os.path.getmtime(_SYMBOL_CACHE) < _SYMBOL_CACHE_TTL):
+            df = pd.read_csv(_SYMBOL_CACHE, dtype={"SYMBOL": "string"})
+        else:
+            url = "https://archives.nseindia.com/content/equities/EQUITY_L.csv"
+            df = pd.read_csv(url, usecols=["SYMBOL"], dtype={"SYMBOL": "string"})
+            os.makedirs(_CACHE_DIR, exist_ok=True)
+            df.to_csv(_SYMBOL_CACHE, index=False)
+        return (df["SYMBOL"] + ".NS").tolist()
+    except:
+        return ["RELIANCE.NS", "TCS.NS", "INFY.NS"]
+
+nse_stock_list = get_all_nse_stocks()
+
+@st.cache_data
+def build_symbol_index(symbols):
+    # Fixed-width string array so np.char runs the per-symbol scan in C.
+    return np.array(sorted(symbols), dtype="U16")
+
+def filter_suggestions(syms_arr, search, limit=20):
+    if not search:
+        return syms_arr[:limit].tolist()
+    # Users overwhelmingly type prefixes; fall back to a substring scan
+    # only when prefix matching comes up short.
+    prefix = np.char.startswith(syms_arr, search)
+    hits = syms_arr[prefix]
+    if len(hits) < limit:
+        substr = np.char.find(syms_arr, search) >= 0
+        hits = np.concatenate([hits, syms_arr[substr & ~prefix]])
+    return hits[:limit].tolist()
+
+# ----------------------------------------------------------
+# CACHED YAHOO FINANCE ACCESS
+# ----------------------------------------------------------
+@st.cache_resource
+def get_ticker(symbol):
+    return yf.Ticker(symbol)
+
+_IST = timezone(timedelta(hours=5, minutes=30))
+
+def _history_cache_fresh(path):
+    # Max history only changes once per trading day; treat the on-disk
+    # copy as fresh if it was written after today's 09:00 IST open.
+    market_open = datetime.now(_IST).replace(hour=9, minute=0, second=0, microsecond=0)
+    return os.path.getmtime(path) > market_open.timestamp()
+
+@st.cache_data(ttl=3600)
+def get_max_history(symbol):
+    os.makedirs(_CACHE_DIR, exist_ok=True)
+    path = os.path.join(_CACHE_DIR, f"{symbol}.pkl.gz")
+    if os.path.exists(path) and _history_cache_fresh(path):
+        try:
+            return pd.read_pickle(path)
+        except:
+            pass
+    df = get_ticker(symbol).history(period="max")
+    # history() returns an empty frame on network errors/rate limits;
+    # don't persist that as a day's worth of "fresh" data.
+    if not df.empty:
+        df.to_pickle(path)  # gzip-compressed, inferred from the extension
+    return df
+
+@st.cache_data(ttl=3600)
+def get_info(symbol):
+    return get_ticker(symbol).info
+
+@st.cache_data(ttl=3600)
+def get_fast_info(symbol):
+    # fast_info hits a single lightweight endpoint; .info scrapes dozens
+    # of fields and is much slower. Attributes can be None or raise for
+    # suspended/illiquid symbols -- leave those keys out so the .get
+    # defaults downstream still apply.
+    fi = get_ticker(symbol).fast_info
+    info = {}
+    for key, attr in [("currentPrice", "last_price"),
+                      ("previousClose", "previous_close"),
+                      ("marketCap", "market_cap")]:
+        try:
+            value = getattr(fi, attr)
+        except:
+            value = None
+        if value is not None:
+            info[key] = value
+    return info
+
+@st.cache_data(ttl=3600)
+def get_trailing_pe(symbol):
+    # Only field that still needs the heavyweight .info scrape.
+    return get_info(symbol).get("trailingPE")
+
+# ---------------- MARKET CAP FORMAT ----------------
+def format_market_cap(value):
+    try:
+        return f"₹{value/1e7:.2f} Cr"
+    except:
+        return "N/A"
+
+# ---------------- PERCENT CHANGE ----------------
+def _pct(now, ref):
+    """Percent change of now vs ref; ref may be a scalar or a NumPy array."""
+    if np.ndim(ref) == 0 and not ref:
+        return "N/A"
+    return np.round((now / ref - 1) * 100, 2)
+
+# ---------------- RATINGS ----------------
+def pe_rating(pe):
+    if pe is None or pe <= 0: return "N/A"
+    if pe < 20: return "Excellent"
+    if pe <= 35: return "Good"
+    return "Poor"
+
+# ---------------- BUYING RECOMMENDATION ----------------
+try:
+    from numba import njit
+except ImportError:
+    def njit(*args, **kwargs):
+        return args[0] if args and callable(args[0]) else (lambda f: f)
+
+@njit(cache=True)
+def _indicators(close):
+    """One pass over the closes: SMA20, EMA20 and Wilder RSI(14)."""
+    n = len(close)
+    alpha = 2.0 / 21.0
+    ema = close[0]
+    window = 0.0
+    avg_gain = 0.0
+    avg_loss = 0.0
+    for i in range(n):
+        ema = alpha * close[i] + (1.0 - alpha) * ema
+        window += close[i]
+        if i >= 20:
+            window -= close[i - 20]
+        if i > 0:
+            delta = close[i] - close[i - 1]
+            gain = delta if delta > 0 else 0.0
+            loss = -delta if delta < 0 else 0.0
+            if i <= 14:
+                avg_gain += gain / 14.0
+                avg_loss += loss / 14.0
+            else:
+                avg_gain = (avg_gain * 13.0 + gain) / 14.0
+                avg_loss = (avg_loss * 13.0 + loss) / 14.0
+    sma = window / min(n, 20)
+    rsi = 100.0 if avg_loss == 0.0 else 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+    return sma, ema, rsi
+
+def buying_recommendation(close):
+    try:
+        sma20, ema20, rsi = _indicators(close)
+
+        latest = close[-1]
+        score = 0
+        score += 40 if latest > sma20 else 0
+        score += 40 if latest > ema20 else 0
+        score += 20 if rsi < 70 else 0
+
+        return min(score, 100)
+    except:
+        return 50
+
+# ---------------- PERFORMANCE ----------------
+def performance(df):
+    close = df["Close"].to_numpy()
+    last = close[-1] if len(close) else 0
+    horizons = np.array([21, 63, 126])
+    labels = ["1 Month", "3 Month", "6 Month"]
+    mask = horizons < len(close)
+    refs = close[-horizons[mask]]
+    pcts = _pct(last, refs)
+
+    perf = dict.fromkeys(labels, "N/A")
+    perf.update(zip(np.array(labels)[mask], pcts))
+    return perf
+
+# ---------------- IPO EXTRA DETAILS ----------------
+def get_ipo_extra_details():
+    return {
+        "Price Range": "N/A",
+        "Issue Size": "N/A",
+        "Lot Size": "N/A",
+        "Subscription Rate": "N/A"
+    }
+
+# ---------------- PDF REPORT ----------------
+# ReportLab can't render the rupee sign with the built-in Helvetica fonts.
+_RUPEE_TRANS = str.maketrans({"₹": "Rs."})
+
+_BODY_TABLE_STYLE = TableStyle([
+    ("FONTNAME", (0, 0), (-1, -1), "Helvetica"),
+    ("FONTSIZE", (0, 0), (-1, -1), 10),
+    ("LEFTPADDING", (0, 0), (-1, -1), 0),
+    ("BOTTOMPADDING", (0, 0), (-1, -1), 5),
+])
+
+_TITLE_STYLE = ParagraphStyle(
+    "title", fontSize=20, alignment=TA_CENTER,
+    textColor=colors.HexColor("#003366"),
+    fontName="Helvetica-Bold", spaceAfter=14
+)
+_HEADER_STYLE = ParagraphStyle(
+    "header", alignment=TA_CENTER, fontSize=11,
+    textColor=colors.grey, spaceAfter=18
+)
+_SECTION_STYLE = ParagraphStyle(
+    "section", fontSize=13,
+    textColor=colors.HexColor("#0b5394"),
+    fontName="Helvetica-Bold",
+    spaceBefore=14, spaceAfter=6
+)
+
+def build_pdf(data):
+    date, day, time_of_day = datetime.now().strftime("%d-%m-%Y|%A|%H:%M:%S").split("|")
+    buf = io.BytesIO()
+    doc = SimpleDocTemplate(buf, pagesize=A4)
+
+    story = []
+    story.append(Paragraph("STOCK ANALYSIS REPORT", _TITLE_STYLE))
+    story.append(Paragraph(
+        f"Report Created By : <b>Jayesh Thakor</b><br/>"
+        f"Date : {date} | Day : {day} | Time : {time_of_day}",
+        _HEADER_STYLE
+    ))
+
+    for sec, lines in data.items():
+        story.append(Paragraph(sec, _SECTION_STYLE))
+        story.append(Table([[l.translate(_RUPEE_TRANS)] for l in lines],
+                           style=_BODY_TABLE_STYLE, hAlign="LEFT"))
+
+    doc.build(story)
+    return buf.getvalue()
+
+
+# ----------------------------------------------------------
+# STREAMLIT UI
+# ----------------------------------------------------------
+st.set_page_config(page_title="Stock Analyzer by Jayesh", layout="wide")
+
+st.markdown("<h1 style='text-align:center;color:#00ffcc;'>📈 Stock Market Analyzer — By Jayesh Thakor</h1>", unsafe_allow_html=True)
+
+search = st.text_input("Search Stock Symbol", "").upper()
+
+suggestions = filter_suggestions(build_symbol_index(nse_stock_list), search)
+symbol = st.selectbox("Select Stock", suggestions)
+
+# The fragment reruns in isolation on the button click, skipping the
+# header render, symbol-list rebuild and suggestion filtering upstream.
+@st.fragment
+def analyze_panel(symbol):
+    if st.button("ANALYZE STOCK"):
+        if not symbol:
+            st.warning("Please select stock.")
+        else:
+            # History and fast_info are independent I/O-bound requests;
+            # overlap them so the wait is max(t_hist, t_info), not the sum.
+            with ThreadPoolExecutor(2) as ex:
+                f_hist = ex.submit(get_max_history, symbol)
+                f_info = ex.submit(get_fast_info, symbol)
+                hist = f_hist.result()
+                info = f_info.result()
+            if hist.empty:
+                # Failed fetch -- drop the memoized empty frame so the
+                # next click retries instead of serving it for an hour.
+                get_max_history.clear(symbol)
+            df = hist.tail(126)
+
+            current = info.get("currentPrice", 0)
+            prev = info.get("previousClose", current)
+            pe = get_trailing_pe(symbol)
+            momentum = _pct(current, prev)
+            listing_date = hist.index[0].strftime("%d-%m-%Y") if not hist.empty else "N/A"
+            listing_price = round(hist.iloc[0]["Open"], 2) if not hist.empty else "N/A"
+
+            profit_pct = _pct(current, listing_price) if listing_price != "N/A" else "N/A"
+
+            perf = performance(df)
+            rec = buying_recommendation(df["Close"].to_numpy(dtype=np.float64))
+            ipo_extra = get_ipo_extra_details()
+
+            # -------------------- SHOW REPORT --------------------
+            st.subheader("📄 Stock Report")
+            st.write(f"**Stock:** {symbol}")
+            st.write(f"**Current Price:** ₹{current}")
+            st.write(f"**Momentum:** {momentum}%")
+
+            st.subheader("IPO DETAILS")
+            st.write(f"IPO Date: {listing_date}")
+            st.write(f"IPO Price: ₹{listing_price}")
+            st.write(f"Return Since IPO: {profit_pct}%")
+
+            st.subheader("FUNDAMENTALS")
+            st.write(f"Market Cap: {format_market_cap(info.get('marketCap',0))}")
+            st.write(f"P/E Ratio: {pe if pe is not None else 'N/A'} ({pe_rating(pe)})")
+
+            st.subheader("PERFORMANCE")
+            st.write(perf)
+
+            st.subheader("BUYING SCORE")
+            st.write(f"**Overall Score: {rec}%**")
+
+            # -------------------- PDF --------------------
+            report_data = {
+                "STOCK REPORT BY JAYESH THAKOR": [
+                    f"Stock : {symbol}",
+                    f"Current Price : ₹{current}",
+                    f"Momentum : {momentum} %"
+                ],
+                "IPO DETAILS": [
+                    f"IPO Listing Date : {listing_date}",
+                    f"IPO Listing Price : ₹{listing_price}",
+                    f"Price Range : {ipo_extra['Price Range']}",
+                    f"Issue Size : {ipo_extra['Issue Size']}",
+                    f"Lot Size : {ipo_extra['Lot Size']}",
+                    f"Subscription Rate : {ipo_extra['Subscription Rate']}",
+                    f"Return Since IPO : {profit_pct} %"
+                ],
+                "FUNDAMENTALS": [
+                    f"Market Cap : {format_market_cap(info.get('marketCap',0))}",
+                    f"P/E Ratio : {pe if pe is not None else 'N/A'} ({pe_rating(pe)})"
+                ],
+                "PERFORMANCE": [
+                    f"1 Month : {perf['1 Month']} %",
+                    f"3 Month : {perf['3 Month']} %",
+                    f"6 Month : {perf['6 Month']} %"
+                ],
+                "RECOMMENDATION FOR BUYING": [
+                    f"Overall Score : {rec} %"
+                ]
+            }
+
+            st.session_state.report_data = report_data
+
+            # Passing a callable defers the ReportLab build until the button
+            # is actually clicked instead of paying for it on every analysis.
+            st.download_button(
+                "Download PDF", data=lambda: build_pdf(st.session_state.report_data),
+                file_name=f"{symbol} - Jayesh Thakor Analysis - {datetime.now().strftime('%d-%m-%Y %H-%M-%S')}.pdf",
+                mime="application/pdf",
+            )
+
+            # -------------------- CHART --------------------
+            st.subheader("📊 Candlestick Chart")
+            df2 = hist.tail(15)
+            fig, _ = mpf.plot(df2, type="candle", volume=True, style="charles", returnfig=True)
+            st.pyplot(fig)
+            plt.close(fig)
+
+
+analyze_panel(symbol)